@@ -0,0 +1,118 @@
+"""
+Admission control for the Loan Approval Prediction API
+Bounds concurrent inference, queues a limited number of waiting requests
+and sheds the rest, and enforces per-request deadlines so work for clients
+that have already given up is abandoned early.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """Raised when the wait queue is full and the request is shed"""
+
+    status_code = 429
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its deadline"""
+
+    status_code = 503
+
+
+class Deadline:
+    """Absolute point in time by which a request must finish"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def check(self, stage):
+        """Abandon the request if the deadline passed before `stage`"""
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f"Deadline of {self.timeout * 1000:.0f} ms exceeded before {stage}")
+
+
+class AdmissionController:
+    """Concurrency limiter with a bounded, first-come first-served wait queue"""
+
+    def __init__(self, max_concurrency=4, max_queue=32):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+        self._waiters = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    @property
+    def saturated(self):
+        """True when requests are already waiting for a slot"""
+        return self.queued > 0
+
+    @contextmanager
+    def admit(self, deadline):
+        """Hold an inference slot for the duration of the block
+
+        Requests are admitted in arrival order: while anyone is queued, new
+        arrivals join the back of the queue rather than taking a free slot.
+        Raises Overloaded immediately when the wait queue is full, and
+        DeadlineExceeded if no slot frees up before the deadline.
+        """
+        with self._cond:
+            if self._waiters or self.in_flight >= self.max_concurrency:
+                if len(self._waiters) >= self.max_queue:
+                    self.shed_queue_full += 1
+                    raise Overloaded("Server is at capacity, please retry later")
+
+                ticket = object()
+                self._waiters.append(ticket)
+                try:
+                    while self._waiters[0] is not ticket or self.in_flight >= self.max_concurrency:
+                        remaining = deadline.remaining()
+                        if remaining <= 0:
+                            raise DeadlineExceeded("Deadline exceeded while waiting in queue")
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiters.remove(ticket)
+                    # The next waiter may now be at the head of the queue
+                    self._cond.notify_all()
+
+            self.in_flight += 1
+            self.admitted += 1
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def record_deadline_exceeded(self):
+        with self._cond:
+            self.shed_deadline += 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": self.queued,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "shed": {
+                    "queue_full": self.shed_queue_full,
+                    "deadline_exceeded": self.shed_deadline
+                }
+            }
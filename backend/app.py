@@ -1,70 +1,168 @@
-from flask import Flask, request, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 import joblib
 import pandas as pd
 import numpy as np
 import os
 
+from admission import AdmissionController, Deadline, DeadlineExceeded, Overloaded
+from model_registry import CANARY, PRIMARY, SHADOW, ModelRegistry
+from wire_formats import WireFormatError, decode_request, encode_response, to_columns
+
 app = Flask(__name__)
 CORS(app)
 
+# Raw request bodies above this size are rejected with 413
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_REQUEST_BYTES', 8 * 1024 * 1024))
+
 # Global variables to store model and preprocessors
 model = None
 scaler = None
 label_encoders = None
 feature_columns = None
+feature_importance = None
+category_indexes = None
+
+# Primary model plus any shadow/canary versions, all fed the same features
+registry = ModelRegistry(max_workers=int(os.environ.get('SHADOW_WORKERS', 1)))
+
+# Bounded inference concurrency with a short wait queue; excess load is shed
+admission = AdmissionController(
+    max_concurrency=int(os.environ.get('MAX_CONCURRENT_PREDICTIONS', os.cpu_count() or 4)),
+    max_queue=int(os.environ.get('MAX_QUEUED_PREDICTIONS', 32))
+)
+DEFAULT_TIMEOUT_MS = int(os.environ.get('REQUEST_TIMEOUT_MS', 2000))
+RETRY_AFTER_SECONDS = 1
+
+CATEGORICAL_COLUMNS = ['Gender', 'Married', 'Dependents', 'Education', 
+                       'Self_Employed', 'Property_Area']
+
+REQUIRED_FIELDS = [
+    'Gender', 'Married', 'Dependents', 'Education', 'Self_Employed',
+    'ApplicantIncome', 'CoapplicantIncome', 'LoanAmount', 
+    'Loan_Amount_Term', 'Credit_History', 'Property_Area'
+]
+
+def sorted_feature_importance(estimator):
+    """Feature importance of a trained model, most important first"""
+    if not hasattr(estimator, 'feature_importances_'):
+        return None
+    importance_dict = dict(zip(feature_columns, estimator.feature_importances_.tolist()))
+    return dict(sorted(importance_dict.items(), key=lambda x: x[1], reverse=True))
 
 def load_model():
     """Load the trained model and preprocessors"""
-    global model, scaler, label_encoders, feature_columns
+    global model, scaler, label_encoders, feature_columns, feature_importance, category_indexes
     
     try:
         model = joblib.load('model/loan_model.pkl')
         scaler = joblib.load('model/scaler.pkl')
         label_encoders = joblib.load('model/label_encoders.pkl')
         feature_columns = joblib.load('model/feature_columns.pkl')
+        # Importance is fixed for a trained model, so compute it once
+        feature_importance = sorted_feature_importance(model)
+        # Class -> code lookup for each categorical column, same codes as LabelEncoder
+        category_indexes = {
+            col: pd.Index(label_encoders[col].classes_)
+            for col in CATEGORICAL_COLUMNS if col in label_encoders
+        }
+        registry.register('loan_model', model, role=PRIMARY,
+                          feature_importance=feature_importance)
+        load_candidate_versions()
         print("✅ Model and preprocessors loaded successfully!")
         return True
     except Exception as e:
         print(f"❌ Error loading model: {e}")
         return False
 
-def preprocess_input(data):
-    """Preprocess input data for prediction"""
+def load_candidate_versions():
+    """Register candidate models from model/candidates as shadows or a canary
+    
+    SHADOW_MODELS is a comma-separated list of candidate names (e.g.
+    "decision_tree,logistic_regression"). CANARY_MODEL names one candidate
+    that serves CANARY_TRAFFIC (0-1) of requests instead of the primary.
+    """
+    shadow_names = [name.strip() for name in os.environ.get('SHADOW_MODELS', '').split(',')
+                    if name.strip()]
+    canary_name = os.environ.get('CANARY_MODEL', '').strip()
+    
+    for name in shadow_names:
+        try:
+            shadow = joblib.load(f'model/candidates/{name}.pkl')
+            registry.register(name, shadow, role=SHADOW,
+                              feature_importance=sorted_feature_importance(shadow))
+            print(f"👥 Shadow model loaded: {name}")
+        except Exception as e:
+            print(f"⚠️ Skipping shadow model {name}: {e}")
+    
+    if canary_name:
+        try:
+            traffic = float(os.environ.get('CANARY_TRAFFIC', 0.05))
+            canary = joblib.load(f'model/candidates/{canary_name}.pkl')
+            registry.register(canary_name, canary, role=CANARY, traffic=traffic,
+                              feature_importance=sorted_feature_importance(canary))
+            print(f"🐤 Canary model loaded: {canary_name} ({traffic:.0%} of traffic)")
+        except Exception as e:
+            print(f"⚠️ Skipping canary model {canary_name}: {e}")
+
+def encode_categorical(col, values):
+    """Label-encode a column of values, mapping unknown categories to 0"""
+    codes = category_indexes[col].get_indexer(np.asarray(values, dtype=object))
+    return np.where(codes < 0, 0, codes)
+
+def invalid_rows(columns):
+    """Indices of rows with a null value in any required field"""
+    invalid = np.zeros(0, dtype=bool)
+    for field in REQUIRED_FIELDS:
+        nulls = pd.isna(np.asarray(columns[field], dtype=object))
+        invalid = nulls if invalid.size == 0 else invalid | nulls
+    return np.flatnonzero(invalid).tolist()
+
+def preprocess_columns(columns, n_rows):
+    """Build the scaled feature matrix from a mapping of column -> values"""
     try:
-        # Create DataFrame from input
-        df = pd.DataFrame([data])
-        
-        # Encode categorical variables
-        categorical_columns = ['Gender', 'Married', 'Dependents', 'Education', 
-                              'Self_Employed', 'Property_Area']
-        
-        for col in categorical_columns:
-            if col in df.columns and col in label_encoders:
-                # Handle unknown categories
-                try:
-                    df[col] = label_encoders[col].transform(df[col])
-                except ValueError:
-                    # If unknown category, use the most frequent class
-                    df[col] = 0
-        
-        # Ensure all required columns are present
+        frame = {}
         for col in feature_columns:
-            if col not in df.columns:
-                df[col] = 0
+            values = columns.get(col)
+            if values is None:
+                # Missing columns default to 0, as in training
+                frame[col] = np.zeros(n_rows)
+            elif col in category_indexes:
+                frame[col] = encode_categorical(col, values)
+            else:
+                frame[col] = np.asarray(values, dtype=float)
         
-        # Reorder columns to match training data
-        df = df[feature_columns]
+        # Keep column names so the scaler sees the same layout as in training
+        df = pd.DataFrame(frame, columns=feature_columns)
         
         # Scale features
-        df_scaled = scaler.transform(df)
-        
-        return df_scaled
+        return scaler.transform(df)
     
     except Exception as e:
         print(f"❌ Error in preprocessing: {e}")
         return None
 
+def preprocess_input(data):
+    """Preprocess a single application for prediction"""
+    return preprocess_columns({col: [value] for col, value in data.items()}, 1)
+
+def request_deadline():
+    """Deadline from the X-Request-Timeout header (ms), capped at the server default"""
+    try:
+        timeout_ms = int(request.headers.get('X-Request-Timeout', DEFAULT_TIMEOUT_MS))
+    except ValueError:
+        timeout_ms = DEFAULT_TIMEOUT_MS
+    return Deadline(max(0, min(timeout_ms, DEFAULT_TIMEOUT_MS)) / 1000)
+
+def shed_response(error):
+    """Fast 429 (queue full) or 503 (deadline exceeded) with a Retry-After header"""
+    if isinstance(error, DeadlineExceeded):
+        admission.record_deadline_exceeded()
+    print(f"⏳ Request shed: {error}")
+    response = encode_response({"error": str(error)}, error.status_code)
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
 @app.route('/')
 def home():
     """Health check endpoint"""
@@ -79,46 +177,49 @@ def home():
 def predict():
     """Predict loan approval with balanced approach"""
     try:
-        # Get JSON data from request
-        data = request.get_json()
+        deadline = request_deadline()
+        
+        # Decode JSON or MessagePack body from request (before taking an
+        # inference slot, so slow uploads cannot hold one)
+        data = decode_request()
         
         if not data:
-            return jsonify({"error": "No data provided"}), 400
+            return encode_response({"error": "No data provided"}, 400)
+        if not isinstance(data, dict):
+            return encode_response({"error": "Expected a single application object"}, 400)
         
         # Validate required fields
-        required_fields = [
-            'Gender', 'Married', 'Dependents', 'Education', 'Self_Employed',
-            'ApplicantIncome', 'CoapplicantIncome', 'LoanAmount', 
-            'Loan_Amount_Term', 'Credit_History', 'Property_Area'
-        ]
-        
-        missing_fields = [field for field in required_fields if field not in data]
+        missing_fields = [field for field in REQUIRED_FIELDS if field not in data]
         if missing_fields:
-            return jsonify({
+            return encode_response({
                 "error": f"Missing required fields: {missing_fields}"
-            }), 400
+            }, 400)
         
-        # Preprocess input
-        processed_data = preprocess_input(data)
-        if processed_data is None:
-            return jsonify({"error": "Error processing input data"}), 400
+        null_fields = [field for field in REQUIRED_FIELDS if data[field] is None]
+        if null_fields:
+            return encode_response({
+                "error": f"Required fields cannot be null: {null_fields}"
+            }, 400)
         
-        # Make prediction
-        prediction = model.predict(processed_data)[0]
-        prediction_proba = model.predict_proba(processed_data)[0]
+        # Only preprocessing and scoring run under admission control
+        with admission.admit(deadline):
+            # Preprocess input
+            deadline.check("preprocessing")
+            processed_data = preprocess_input(data)
+            if processed_data is None:
+                return encode_response({"error": "Error processing input data"}, 400)
+            
+            # Make prediction (shadow versions score the same features in the background)
+            deadline.check("inference")
+            version, predictions, probabilities = registry.predict(
+                processed_data, shadow=not admission.saturated)
+        prediction = predictions[0]
+        prediction_proba = probabilities[0]
         
         # Convert prediction to readable format
         loan_status = "Approved" if prediction == 1 else "Rejected"
         confidence = float(max(prediction_proba))
         
-        # Get feature importance if available
-        feature_importance = None
-        if hasattr(model, 'feature_importances_'):
-            importance_dict = dict(zip(feature_columns, model.feature_importances_))
-            # Sort by importance
-            feature_importance = dict(sorted(importance_dict.items(), 
-                                           key=lambda x: x[1], reverse=True))
-        
         # Add helpful message
         message = ""
         if loan_status == "Approved":
@@ -131,15 +232,84 @@ def predict():
             "confidence": round(confidence, 4),
             "message": message,
             "input_data": data,
-            "feature_importance": feature_importance
+            # Importance of the version that served this prediction (may be a canary)
+            "feature_importance": version.feature_importance
         }
         
         print(f"🔍 Prediction made: {loan_status} (Confidence: {confidence:.2%})")
-        return jsonify(response)
+        result = encode_response(response)
+        result.headers['X-Model-Version'] = version.name
+        return result
     
+    except (Overloaded, DeadlineExceeded) as e:
+        return shed_response(e)
+    except WireFormatError as e:
+        return encode_response({"error": str(e)}, e.status_code)
     except Exception as e:
         print(f"❌ Prediction error: {str(e)}")
-        return jsonify({"error": f"Prediction error: {str(e)}"}), 500
+        return encode_response({"error": f"Prediction error: {str(e)}"}, 500)
+
+@app.route('/predict-batch', methods=['POST'])
+def predict_batch():
+    """Predict loan approval for many applications at once
+    
+    Accepts a list of application objects, a mapping of field -> list of
+    values, or an Arrow IPC stream. Returns columnar `prediction` and
+    `confidence` lists (or an Arrow table when requested).
+    """
+    try:
+        deadline = request_deadline()
+        payload = decode_request()
+        if payload is None:
+            return encode_response({"error": "No data provided"}, 400)
+        
+        columns, n_rows = to_columns(payload)
+        if n_rows == 0:
+            return encode_response({"error": "No applications provided"}, 400)
+        
+        missing_fields = [field for field in REQUIRED_FIELDS if field not in columns]
+        if missing_fields:
+            return encode_response({
+                "error": f"Missing required fields: {missing_fields}"
+            }, 400)
+        
+        # Rows missing a field (list form) or holding null are rejected, as in /predict
+        bad_rows = invalid_rows(columns)
+        if bad_rows:
+            return encode_response({
+                "error": f"Missing or null required fields in {len(bad_rows)} rows",
+                "invalid_rows": bad_rows[:100]
+            }, 400)
+        
+        with admission.admit(deadline):
+            deadline.check("preprocessing")
+            processed_data = preprocess_columns(columns, n_rows)
+            if processed_data is None:
+                return encode_response({"error": "Error processing input data"}, 400)
+            
+            # A single predict_proba pass gives both the class and the confidence
+            deadline.check("inference")
+            version, predictions, probabilities = registry.predict(
+                processed_data, shadow=not admission.saturated)
+        
+        response = {
+            "prediction": np.where(predictions == 1, "Approved", "Rejected").tolist(),
+            # Python round() to match /predict exactly (np.round differs on ties)
+            "confidence": [round(c, 4) for c in probabilities.max(axis=1).tolist()]
+        }
+        
+        print(f"🔍 Batch prediction made for {n_rows} applications")
+        result = encode_response(response, columnar=True)
+        result.headers['X-Model-Version'] = version.name
+        return result
+    
+    except (Overloaded, DeadlineExceeded) as e:
+        return shed_response(e)
+    except WireFormatError as e:
+        return encode_response({"error": str(e)}, e.status_code)
+    except Exception as e:
+        print(f"❌ Batch prediction error: {str(e)}")
+        return encode_response({"error": f"Prediction error: {str(e)}"}, 500)
 
 @app.route('/model-info')
 def model_info():
@@ -153,28 +323,32 @@ def model_info():
         }
         
         # Add feature importance if available
-        if hasattr(model, 'feature_importances_'):
-            importance_dict = dict(zip(feature_columns, model.feature_importances_))
-            info["feature_importance"] = dict(sorted(importance_dict.items(), 
-                                                   key=lambda x: x[1], reverse=True))
+        if feature_importance is not None:
+            info["feature_importance"] = feature_importance
         
         return jsonify(info)
     
     except Exception as e:
         return jsonify({"error": f"Error getting model info: {str(e)}"}), 500
 
+@app.route('/models')
+def models():
+    """Per-version scoring statistics for the primary, shadow and canary models"""
+    return jsonify(registry.stats())
+
 @app.route('/health')
 def health():
     """Detailed health check"""
     return jsonify({
-        "status": "healthy",
+        "status": "degraded" if admission.saturated else "healthy",
         "model_loaded": model is not None,
         "components": {
             "model": "✅" if model is not None else "❌",
             "scaler": "✅" if scaler is not None else "❌",
             "encoders": "✅" if label_encoders is not None else "❌",
             "features": "✅" if feature_columns is not None else "❌"
-        }
+        },
+        "admission": admission.stats()
     })
 
 if __name__ == '__main__':
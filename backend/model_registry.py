@@ -0,0 +1,196 @@
+"""
+Model registry for the Loan Approval Prediction API
+Serves a primary model alongside shadow and canary versions. Every version
+scores the same preprocessed feature matrix; shadows run on a worker pool
+off the request path and are compared against the served prediction.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+PRIMARY = 'primary'
+SHADOW = 'shadow'
+CANARY = 'canary'
+
+
+def score(model, X):
+    """Return (predictions, probabilities) from a single predict_proba pass"""
+    probabilities = model.predict_proba(X)
+    return model.classes_[probabilities.argmax(axis=1)], probabilities
+
+
+class ModelVersion:
+    """A registered model together with its live scoring statistics"""
+
+    def __init__(self, name, model, role, traffic=0.0, feature_importance=None,
+                 latency_window=1000):
+        self.name = name
+        self.model = model
+        self.role = role
+        self.traffic = traffic
+        self.feature_importance = feature_importance
+        self.requests = 0
+        self.rows = 0
+        self.served = 0
+        self.compared_rows = 0
+        self.agreements = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def record(self, latency, rows, agreements=None, served=False):
+        with self._lock:
+            self.requests += 1
+            self.rows += rows
+            self._latencies.append(latency)
+            if served:
+                self.served += 1
+            if agreements is not None:
+                self.compared_rows += rows
+                self.agreements += agreements
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            info = {
+                "role": self.role,
+                "model_type": type(self.model).__name__,
+                "requests": self.requests,
+                "rows": self.rows,
+                "served": self.served,
+                "errors": self.errors,
+                "agreement": (round(self.agreements / self.compared_rows, 4)
+                              if self.compared_rows else None),
+                "latency_ms": None
+            }
+        if self.role == CANARY:
+            info["traffic"] = self.traffic
+        if latencies:
+            info["latency_ms"] = {
+                "mean": round(1000 * sum(latencies) / len(latencies), 3),
+                "p50": round(1000 * latencies[len(latencies) // 2], 3),
+                "p95": round(1000 * latencies[int(len(latencies) * 0.95)], 3),
+                "max": round(1000 * latencies[-1], 3)
+            }
+        return info
+
+
+class ModelRegistry:
+    """Primary, shadow and canary model versions sharing one feature matrix"""
+
+    def __init__(self, max_workers=1, max_pending=64):
+        self.versions = {}
+        self.max_pending = max_pending
+        self.shadow_submitted = 0
+        self.shadow_dropped = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='shadow-scoring')
+
+    @property
+    def primary(self):
+        return next((v for v in self.versions.values() if v.role == PRIMARY), None)
+
+    def register(self, name, model, role=SHADOW, traffic=0.0, feature_importance=None):
+        """Add a model version; registering a new primary replaces the old one
+
+        `feature_importance` is kept with the version so responses describe
+        the model that actually served them.
+        """
+        if role not in (PRIMARY, SHADOW, CANARY):
+            raise ValueError(f"Unknown model role: {role}")
+        if not 0.0 <= traffic <= 1.0:
+            raise ValueError("Canary traffic must be between 0 and 1")
+        if role == PRIMARY and self.primary is not None:
+            del self.versions[self.primary.name]
+        self.versions[name] = ModelVersion(name, model, role, traffic, feature_importance)
+        return self.versions[name]
+
+    def _choose_serving(self):
+        """Pick the primary, or a canary for its share of traffic"""
+        for version in self.versions.values():
+            if version.role == CANARY and random.random() < version.traffic:
+                return version
+        return self.primary
+
+    def predict(self, X, shadow=True):
+        """Score X with the serving version and queue the rest as shadows
+
+        Returns (version, predictions, probabilities) where `version` is the
+        ModelVersion that served the request. The other versions are scored
+        together in one background job that never delays the response; when
+        the shadow queue is full, or `shadow` is False, that work is dropped.
+        """
+        serving = self._choose_serving()
+        if serving is None:
+            raise RuntimeError("No primary model registered")
+
+        start = time.perf_counter()
+        try:
+            predictions, probabilities = score(serving.model, X)
+        except Exception:
+            serving.record_error()
+            raise
+        serving.record(time.perf_counter() - start, len(X), served=True)
+
+        shadows = [version for version in self.versions.values() if version is not serving]
+        if shadows:
+            if shadow:
+                self._submit_shadows(shadows, X, predictions)
+            else:
+                with self._lock:
+                    self.shadow_dropped += len(shadows)
+
+        return serving, predictions, probabilities
+
+    def _submit_shadows(self, shadows, X, served_predictions):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.shadow_dropped += len(shadows)
+                return
+            self._pending += 1
+            self.shadow_submitted += len(shadows)
+        try:
+            self._executor.submit(self._score_shadows, shadows, X, served_predictions)
+        except RuntimeError as e:
+            # Executor shut down: give the slot back so shadows are not wedged
+            with self._lock:
+                self._pending -= 1
+                self.shadow_submitted -= len(shadows)
+                self.shadow_dropped += len(shadows)
+            print(f"⚠️ Could not queue shadow scoring: {e}")
+
+    def _score_shadows(self, shadows, X, served_predictions):
+        try:
+            for version in shadows:
+                try:
+                    start = time.perf_counter()
+                    predictions, _ = score(version.model, X)
+                    agreements = int((predictions == served_predictions).sum())
+                    version.record(time.perf_counter() - start, len(X), agreements)
+                except Exception as e:
+                    version.record_error()
+                    print(f"❌ Shadow scoring error ({version.name}): {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self):
+        with self._lock:
+            pending, submitted, dropped = self._pending, self.shadow_submitted, self.shadow_dropped
+        return {
+            "versions": {name: v.stats() for name, v in self.versions.items()},
+            "shadow_pending": pending,
+            "shadow_submitted": submitted,
+            "shadow_dropped": dropped,
+            "shadow_coverage": (round(submitted / (submitted + dropped), 4)
+                                if submitted + dropped else None)
+        }
@@ -4,7 +4,22 @@ Run this after starting the Flask server to test the API endpoints
 """
 
 import requests
+import gzip
 import json
+import socket
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Optional codecs - their round-trip checks are skipped when missing
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
 
 # API base URL
 BASE_URL = "http://localhost:5000"
@@ -139,6 +154,365 @@ def test_multiple_predictions():
         except Exception as e:
             print(f"   ❌ Error: {e}")
 
+# Applications shared by the batch tests
+BATCH_APPLICATIONS = [
+    {
+        "Gender": "Male", "Married": "Yes", "Dependents": "1",
+        "Education": "Graduate", "Self_Employed": "No",
+        "ApplicantIncome": 5849, "CoapplicantIncome": 0, "LoanAmount": 146,
+        "Loan_Amount_Term": 360, "Credit_History": 1, "Property_Area": "Urban"
+    },
+    {
+        "Gender": "Male", "Married": "No", "Dependents": "2",
+        "Education": "Not Graduate", "Self_Employed": "Yes",
+        "ApplicantIncome": 2000, "CoapplicantIncome": 0, "LoanAmount": 500,
+        "Loan_Amount_Term": 180, "Credit_History": 0, "Property_Area": "Rural"
+    },
+    {
+        "Gender": "Female", "Married": "Yes", "Dependents": "3+",
+        "Education": "Graduate", "Self_Employed": "No",
+        "ApplicantIncome": 4500, "CoapplicantIncome": 2000, "LoanAmount": 300,
+        "Loan_Amount_Term": 360, "Credit_History": 1, "Property_Area": "Semiurban"
+    }
+]
+
+def to_columns(rows):
+    """Turn a list of applications into a mapping of field -> list of values"""
+    return {field: [row[field] for row in rows] for field in rows[0]}
+
+def check(name, passed, detail=""):
+    """Print a pass/fail line and return the outcome"""
+    print(f"   {'✅' if passed else '❌'} {name}{f' ({detail})' if detail else ''}")
+    return passed
+
+def batch_matches(response, expected):
+    """Compare a JSON /predict-batch response with (prediction, confidence) pairs"""
+    if response.status_code != 200:
+        return False, f"status {response.status_code}"
+    body = response.json()
+    actual = list(zip(body["prediction"], body["confidence"]))
+    return actual == expected, f"{actual} vs {expected}" if actual != expected else ""
+
+def test_batch_prediction():
+    """Test that batch predictions match single /predict results"""
+    print("\n🔍 Testing batch prediction...")
+    
+    try:
+        expected = []
+        for row in BATCH_APPLICATIONS:
+            result = requests.post(f"{BASE_URL}/predict", json=row).json()
+            expected.append((result["prediction"], result["confidence"]))
+        
+        results = [
+            check("columnar payload matches /predict", *batch_matches(
+                requests.post(f"{BASE_URL}/predict-batch", json=to_columns(BATCH_APPLICATIONS)),
+                expected)),
+            check("row payload matches /predict", *batch_matches(
+                requests.post(f"{BASE_URL}/predict-batch", json=BATCH_APPLICATIONS),
+                expected))
+        ]
+        return all(results)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+def test_batch_validation():
+    """Test that incomplete batch rows are rejected with their indices"""
+    print("\n🔍 Testing batch validation...")
+    
+    missing_gender = {k: v for k, v in BATCH_APPLICATIONS[1].items() if k != "Gender"}
+    null_amount = dict(BATCH_APPLICATIONS[2], LoanAmount=None)
+    
+    try:
+        rows = requests.post(
+            f"{BASE_URL}/predict-batch",
+            json=[BATCH_APPLICATIONS[0], missing_gender, null_amount]
+        )
+        columns = to_columns(BATCH_APPLICATIONS)
+        columns["Credit_History"][0] = None
+        nulls = requests.post(f"{BASE_URL}/predict-batch", json=columns)
+        
+        results = [
+            check("missing/null fields in rows -> 400",
+                  rows.status_code == 400 and rows.json().get("invalid_rows") == [1, 2],
+                  rows.text),
+            check("null in columns -> 400",
+                  nulls.status_code == 400 and nulls.json().get("invalid_rows") == [0],
+                  nulls.text)
+        ]
+        return all(results)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+def test_batch_wire_formats():
+    """Test MessagePack and Arrow round trips, compression and corrupt bodies"""
+    print("\n🔍 Testing batch wire formats...")
+    
+    try:
+        reference = requests.post(
+            f"{BASE_URL}/predict-batch", json=to_columns(BATCH_APPLICATIONS)).json()
+        results = []
+        
+        if msgpack is not None:
+            response = requests.post(
+                f"{BASE_URL}/predict-batch",
+                data=msgpack.packb(BATCH_APPLICATIONS),
+                headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"}
+            )
+            results.append(check(
+                "MessagePack round trip",
+                response.headers.get("Content-Type") == "application/msgpack"
+                and msgpack.unpackb(response.content) == reference))
+        else:
+            print("   ⚠️ msgpack not installed, skipping MessagePack round trip")
+        
+        if pa is not None:
+            sink = pa.BufferOutputStream()
+            table = pa.table(to_columns(BATCH_APPLICATIONS))
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            response = requests.post(
+                f"{BASE_URL}/predict-batch",
+                data=sink.getvalue().to_pybytes(),
+                headers={"Content-Type": "application/vnd.apache.arrow.stream",
+                         "Accept": "application/vnd.apache.arrow.stream"}
+            )
+            results.append(check(
+                "Arrow IPC round trip",
+                response.status_code == 200
+                and pa.ipc.open_stream(response.content).read_all().to_pydict() == reference))
+        else:
+            print("   ⚠️ pyarrow not installed, skipping Arrow round trip")
+        
+        # 100 rows produce a response well above the 1 KB compression threshold
+        response = requests.post(
+            f"{BASE_URL}/predict-batch",
+            json=BATCH_APPLICATIONS * 100,
+            headers={"Accept-Encoding": "gzip"}
+        )
+        results.append(check(
+            "large response is gzip-compressed",
+            response.headers.get("Content-Encoding") == "gzip"
+            and response.json()["prediction"] == reference["prediction"] * 100,
+            response.headers.get("Content-Encoding")))
+        
+        body = json.dumps(BATCH_APPLICATIONS).encode("utf-8")
+        response = requests.post(
+            f"{BASE_URL}/predict-batch",
+            data=gzip.compress(body),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+        results.append(check(
+            "gzip request body",
+            response.status_code == 200 and response.json() == reference))
+        
+        corrupt = bytearray(gzip.compress(body))
+        corrupt[20:30] = b"\xff" * 10
+        response = requests.post(
+            f"{BASE_URL}/predict-batch",
+            data=bytes(corrupt),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+        results.append(check(
+            "corrupt gzip body -> 400", response.status_code == 400, response.status_code))
+        
+        response = requests.post(
+            f"{BASE_URL}/predict",
+            data=json.dumps(BATCH_APPLICATIONS[0]),
+            headers={"Content-Type": "text/plain"}
+        )
+        results.append(check(
+            "text/plain body -> 415", response.status_code == 415, response.status_code))
+        
+        return all(results)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+def test_models():
+    """Test that shadow versions are scored and compared after predictions"""
+    print("\n🔍 Testing model registry stats...")
+    try:
+        response = requests.get(f"{BASE_URL}/models")
+        print(f"Status Code: {response.status_code}")
+        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        if response.status_code != 200:
+            return False
+        
+        shadows = {name: version for name, version in response.json()["versions"].items()
+                   if version["role"] != "primary"}
+        if not shadows:
+            print("   ⚠️ No shadow models configured (set SHADOW_MODELS), skipping shadow checks")
+            return True
+        return all(
+            check(f"{name} scored with agreement",
+                  version["requests"] > 0 and version["agreement"] is not None,
+                  f"requests={version['requests']}, agreement={version['agreement']}")
+            for name, version in shadows.items()
+        )
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+def test_shadow_overhead(n_requests=300, interval=0.01, min_coverage=0.95):
+    """Compare request-path latency with and without shadow models
+    
+    Runs in-process against model/ (no server needed, but train_model.py
+    must have saved the candidates). Times the whole registry.predict call,
+    including shadow submission, and requires shadows to actually be scored
+    at the test rate so the comparison is not passing on dropped work.
+    """
+    print("\n🔍 Testing shadow scoring overhead...")
+    try:
+        import time
+        import joblib
+        import app
+        from model_registry import PRIMARY, SHADOW, ModelRegistry
+        
+        if not app.load_model():
+            return False
+        X = app.preprocess_input(BATCH_APPLICATIONS[0])
+        shadow_names = ["random_forest", "logistic_regression", "decision_tree"]
+        shadow_models = {name: joblib.load(f"model/candidates/{name}.pkl") for name in shadow_names}
+        
+        def request_latency(with_shadows, n=n_requests):
+            registry = ModelRegistry()
+            registry.register("loan_model", app.model, role=PRIMARY)
+            if with_shadows:
+                for name, shadow in shadow_models.items():
+                    registry.register(name, shadow, role=SHADOW)
+            latencies = []
+            for _ in range(n):
+                start = time.perf_counter()
+                registry.predict(X)
+                latencies.append(time.perf_counter() - start)
+                time.sleep(interval)
+            while registry.stats()["shadow_pending"]:
+                time.sleep(0.01)
+            latencies.sort()
+            return {
+                "p50": round(1000 * latencies[n // 2], 3),
+                "p95": round(1000 * latencies[int(n * 0.95)], 3)
+            }, registry.stats()
+        
+        request_latency(False, n=50)  # warm-up
+        base_ms, _ = request_latency(False)
+        shadow_ms, shadowed = request_latency(True)
+        coverage = shadowed["shadow_coverage"]
+        print(f"   predict() without shadows: p50 {base_ms['p50']} ms, p95 {base_ms['p95']} ms")
+        print(f"   predict() with shadows:    p50 {shadow_ms['p50']} ms, p95 {shadow_ms['p95']} ms "
+              f"(coverage {coverage}, {shadowed['shadow_dropped']} dropped)")
+        
+        results = [
+            check("predict() p95 within 1.5x (+0.5 ms) of baseline",
+                  shadow_ms["p95"] <= max(1.5 * base_ms["p95"], base_ms["p95"] + 0.5)),
+            check(f"shadow coverage >= {min_coverage:.0%}",
+                  coverage is not None and coverage >= min_coverage, coverage)
+        ]
+        for name in shadow_names:
+            version = shadowed["versions"][name]
+            results.append(check(f"{name} scored with agreement",
+                                 version["requests"] >= min_coverage * n_requests
+                                 and version["agreement"] is not None,
+                                 f"requests={version['requests']}, agreement={version['agreement']}"))
+        return all(results)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+def test_load_shedding():
+    """Test that overload is shed quickly instead of queueing without limit"""
+    print("\n🔍 Testing load shedding...")
+    
+    # Large batches from many clients reliably overrun the inference slots
+    burst_payload = to_columns(BATCH_APPLICATIONS * 500)
+    
+    def burst(headers, clients=96, requests_sent=192):
+        def send(_):
+            return requests.post(f"{BASE_URL}/predict-batch", json=burst_payload, headers=headers)
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            return list(pool.map(send, range(requests_sent)))
+    
+    try:
+        before = requests.get(f"{BASE_URL}/health").json()["admission"]["shed"]
+        
+        expired = requests.post(
+            f"{BASE_URL}/predict",
+            json=BATCH_APPLICATIONS[0],
+            headers={"X-Request-Timeout": "0"}
+        )
+        # Short deadlines expire in the queue (503); with the server default
+        # deadline the wait queue fills up instead (429)
+        deadline_burst = burst({"X-Request-Timeout": "20"})
+        queue_burst = burst({})
+        responses = deadline_burst + queue_burst
+        
+        codes = [response.status_code for response in responses]
+        for code in sorted(set(codes)):
+            print(f"   Status {code}: {codes.count(code)} responses")
+        shed = [response for response in responses + [expired]
+                if response.status_code in (429, 503)]
+        
+        after = requests.get(f"{BASE_URL}/health").json()["admission"]["shed"]
+        print(f"   Shed counts: {before} -> {after}")
+        
+        results = [
+            check("expired deadline -> 503", expired.status_code == 503, expired.status_code),
+            check("short deadlines -> 503",
+                  any(response.status_code == 503 for response in deadline_burst)),
+            check("full queue -> 429",
+                  any(response.status_code == 429 for response in queue_burst)),
+            check("only 200/429/503 responses", all(code in (200, 429, 503) for code in codes)),
+            check("shed responses carry Retry-After",
+                  all(response.headers.get("Retry-After") for response in shed)),
+            check("/health counts every 429",
+                  after["queue_full"] - before["queue_full"] == codes.count(429)),
+            check("/health counts every 503",
+                  after["deadline_exceeded"] - before["deadline_exceeded"] == codes.count(503) + 1)
+        ]
+        return all(results)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+def test_stalled_uploads():
+    """Test that stalled request bodies do not hold inference slots"""
+    print("\n🔍 Testing stalled uploads...")
+    
+    url = urlparse(BASE_URL)
+    stalled = []
+    try:
+        slots = requests.get(f"{BASE_URL}/health").json()["admission"]["max_concurrency"]
+        
+        # Send headers and the first byte of the body, then stop, on more
+        # connections than there are inference slots
+        for _ in range(slots + 2):
+            conn = socket.create_connection((url.hostname, url.port or 80))
+            conn.sendall(
+                b"POST /predict HTTP/1.1\r\n"
+                + f"Host: {url.hostname}\r\n".encode()
+                + b"Content-Type: application/json\r\nContent-Length: 1000\r\n\r\n{"
+            )
+            stalled.append(conn)
+        
+        admission = requests.get(f"{BASE_URL}/health").json()["admission"]
+        response = requests.post(f"{BASE_URL}/predict", json=BATCH_APPLICATIONS[0], timeout=5)
+        
+        results = [
+            check("stalled uploads hold no slots", admission["in_flight"] == 0,
+                  f"in_flight={admission['in_flight']}"),
+            check("concurrent valid request succeeds", response.status_code == 200,
+                  response.status_code)
+        ]
+        return all(results)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+    finally:
+        for conn in stalled:
+            conn.close()
+
 def main():
     """Run all tests"""
     print("🧪 Loan Approval API Test Suite")
@@ -158,6 +532,21 @@ def main():
     # Test multiple predictions
     test_multiple_predictions()
     
+    # Test batch prediction, validation and wire formats
+    test_batch_prediction()
+    test_batch_validation()
+    test_batch_wire_formats()
+    
+    # Test model registry stats (after predictions so shadows have scored)
+    test_models()
+    test_shadow_overhead()
+    
+    # Test load shedding under a burst of concurrent requests
+    test_load_shedding()
+    
+    # Test that slow uploads cannot starve inference
+    test_stalled_uploads()
+    
     print("\n✅ All tests completed!")
     print("\n💡 Tips:")
     print("   - Make sure Flask server is running: python app.py")
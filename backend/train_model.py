@@ -5,7 +5,7 @@ from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, Classification_report, confusion_matrix
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
 import os
 
@@ -82,8 +82,12 @@ def preprocess_data(df):
     
     return df, label_encoders
 
+def candidate_slug(name):
+    """File name used for a saved candidate model, e.g. 'random_forest'"""
+    return name.lower().replace(' ', '_')
+
 def train_models(X_train, X_test, y_train, y_test):
-    """Train multiple ML models and return the best one"""
+    """Train multiple ML models and return the best one along with all candidates"""
     models = {
         'Logistic Regression': LogisticRegression(random_state=42, class_weight='balanced'),
         'Decision Tree': DecisionTreeClassifier(random_state=42, class_weight='balanced'),
@@ -119,7 +123,7 @@ def train_models(X_train, X_test, y_train, y_test):
             best_name = name
     
     print(f"\nBest Model: {best_name} with accuracy: {best_score:.4f}")
-    return best_model, best_name
+    return best_model, best_name, models
 
 def main():
     """Main training pipeline"""
@@ -151,10 +155,11 @@ def main():
     
     # Train models with balanced class weights
     print("Training balanced models...")
-    best_model, best_name = train_models(X_train_scaled, X_test_scaled, y_train, y_test)
+    best_model, best_name, candidates = train_models(X_train_scaled, X_test_scaled, y_train, y_test)
     
-    # Create model directory
+    # Create model directories
     os.makedirs('model', exist_ok=True)
+    os.makedirs('model/candidates', exist_ok=True)
     
     # Save model and preprocessors
     joblib.dump(best_model, 'model/loan_model.pkl')
@@ -162,10 +167,15 @@ def main():
     joblib.dump(label_encoders, 'model/label_encoders.pkl')
     joblib.dump(X.columns.tolist(), 'model/feature_columns.pkl')
     
+    # Keep every candidate so the API can score them as shadow/canary versions
+    for name, model in candidates.items():
+        joblib.dump(model, f"model/candidates/{candidate_slug(name)}.pkl")
+    
     print(f"\n✅ Model training completed!")
     print(f"🏆 Best model ({best_name}) saved to model/loan_model.pkl")
     print("📊 Scaler saved to model/scaler.pkl")
     print("🏷️ Label encoders saved to model/label_encoders.pkl")
+    print(f"🗂️ {len(candidates)} candidate models saved to model/candidates/")
     
     # Feature importance (if available)
     if hasattr(best_model, 'feature_importances_'):
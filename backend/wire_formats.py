@@ -0,0 +1,244 @@
+"""
+Wire formats for the Loan Approval Prediction API
+Content negotiation for JSON, MessagePack and Arrow IPC bodies, plus
+gzip/zstd compression of large responses
+"""
+
+import gzip
+import io
+import json
+import zlib
+
+from flask import Response, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Optional fast encoders - fall back to the standard library when missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_THRESHOLD = 1024
+
+# Upper bound on a request body after decompression
+MAX_DECOMPRESSED_SIZE = 32 * 1024 * 1024
+
+
+class WireFormatError(ValueError):
+    """Raised when a request body cannot be decoded"""
+
+    status_code = 400
+
+
+class PayloadTooLarge(WireFormatError):
+    """Raised when a request body exceeds the size limits"""
+
+    status_code = 413
+
+
+class UnsupportedMediaType(WireFormatError):
+    """Raised when the request Content-Type is not a supported wire format"""
+
+    status_code = 415
+
+
+def available_mimetypes(columnar=False):
+    """Response mimetypes supported in this environment, preferred first"""
+    mimetypes = [JSON_MIMETYPE]
+    if msgpack is not None:
+        mimetypes.extend(MSGPACK_MIMETYPES)
+    if columnar and pa is not None:
+        mimetypes.append(ARROW_MIMETYPE)
+    return mimetypes
+
+
+def _gunzip(body, limit):
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    data = decompressor.decompress(body, limit + 1)
+    if len(data) > limit:
+        raise PayloadTooLarge(f"Decompressed body exceeds {limit} bytes")
+    if not decompressor.eof:
+        raise WireFormatError("Truncated gzip body")
+    return data
+
+
+def _unzstd(body, limit):
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body))
+    chunks, size = [], 0
+    while True:
+        chunk = reader.read(64 * 1024)
+        if not chunk:
+            return b''.join(chunks)
+        size += len(chunk)
+        if size > limit:
+            raise PayloadTooLarge(f"Decompressed body exceeds {limit} bytes")
+        chunks.append(chunk)
+
+
+def _decompress(body, encoding, limit=MAX_DECOMPRESSED_SIZE):
+    """Undo the request Content-Encoding, refusing to expand past `limit` bytes"""
+    encoding = (encoding or '').strip().lower()
+    if encoding in ('', 'identity'):
+        return body
+    if encoding == 'gzip':
+        return _gunzip(body, limit)
+    if encoding == 'zstd' and zstandard is not None:
+        return _unzstd(body, limit)
+    raise WireFormatError(f"Unsupported Content-Encoding: {encoding}")
+
+
+def _loads_json(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _dumps_json(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload).encode('utf-8')
+
+
+def decode_request():
+    """Decode the current request body based on its Content-Type
+
+    Returns a dict/list for JSON and MessagePack bodies, or a pyarrow Table
+    for Arrow IPC streams. Returns None for an empty body. Any other
+    Content-Type raises UnsupportedMediaType before the body is read.
+    """
+    mimetype = request.mimetype
+    if mimetype in MSGPACK_MIMETYPES:
+        if msgpack is None:
+            raise UnsupportedMediaType("MessagePack support is not installed")
+    elif mimetype == ARROW_MIMETYPE:
+        if pa is None:
+            raise UnsupportedMediaType("Arrow support is not installed")
+    elif not (mimetype == JSON_MIMETYPE or mimetype.endswith('+json')):
+        raise UnsupportedMediaType(f"Unsupported Content-Type: {mimetype or 'none'}")
+
+    try:
+        body = _decompress(request.get_data(cache=False),
+                           request.headers.get('Content-Encoding'))
+    except RequestEntityTooLarge:
+        raise PayloadTooLarge("Request body exceeds the maximum allowed size")
+    except WireFormatError:
+        raise
+    except Exception as e:
+        # zlib.error, zstandard.ZstdError and friends
+        raise WireFormatError(f"Could not decompress request body: {e}")
+
+    if not body:
+        return None
+
+    try:
+        if mimetype in MSGPACK_MIMETYPES:
+            return msgpack.unpackb(body, raw=False)
+        if mimetype == ARROW_MIMETYPE:
+            return pa.ipc.open_stream(body).read_all()
+        return _loads_json(body)
+    except Exception as e:
+        raise WireFormatError(f"Could not decode {mimetype} body: {e}")
+
+
+def to_columns(payload):
+    """Turn a batch payload into a mapping of column name -> array-like
+
+    Accepts an Arrow table, a dict of column lists, or a list of row dicts.
+    Arrow columns are converted straight to numpy arrays without building
+    per-row Python objects. Fields absent from some rows become None so the
+    caller can reject them together with explicit nulls.
+    """
+    if pa is not None and isinstance(payload, pa.Table):
+        return {
+            name: payload.column(name).to_numpy()
+            for name in payload.column_names
+        }, payload.num_rows
+
+    if isinstance(payload, dict):
+        columns = list(payload.values())
+        if not columns or not all(isinstance(values, (list, tuple)) for values in columns):
+            raise WireFormatError("Columnar payload must map each field to a list")
+        lengths = {len(values) for values in columns}
+        if len(lengths) != 1:
+            raise WireFormatError("Columnar payload lists must all have the same length")
+        return dict(payload), lengths.pop()
+
+    if isinstance(payload, list):
+        if not all(isinstance(row, dict) for row in payload):
+            raise WireFormatError("Row payload must be a list of objects")
+        names = {name for row in payload for name in row}
+        return {
+            name: [row.get(name) for row in payload] for name in names
+        }, len(payload)
+
+    raise WireFormatError("Batch payload must be a list of rows or a mapping of columns")
+
+
+def _encode_arrow(payload):
+    table = pa.table(payload)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _negotiate_encoding(size):
+    """Pick a Content-Encoding from Accept-Encoding for a body of `size` bytes"""
+    if size < COMPRESSION_THRESHOLD:
+        return None
+    accepted = request.accept_encodings
+    if zstandard is not None and accepted['zstd']:
+        return 'zstd'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def encode_response(payload, status=200, columnar=False):
+    """Encode `payload` using the client's Accept header
+
+    `columnar` payloads (dicts of equal-length lists) may additionally be
+    sent as an Arrow IPC stream. Large bodies are compressed when the client
+    advertises gzip or zstd support.
+    """
+    mimetype = request.accept_mimetypes.best_match(
+        available_mimetypes(columnar), default=JSON_MIMETYPE)
+
+    if mimetype in MSGPACK_MIMETYPES:
+        body = msgpack.packb(payload, use_bin_type=True)
+    elif mimetype == ARROW_MIMETYPE:
+        body = _encode_arrow(payload)
+    else:
+        body = _dumps_json(payload)
+
+    encoding = _negotiate_encoding(len(body))
+    if encoding == 'zstd':
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=5)
+
+    response = Response(body, status=status, mimetype=mimetype)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response